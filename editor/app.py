@@ -2,6 +2,7 @@ import tkinter
 import enum
 import logging
 import itertools
+import functools
 import math
 from input_parser import InputParser
 from street_data import *
@@ -25,32 +26,57 @@ class App(tkinter.Tk):
         self.item_editor.grid(row=0, column=0)
         self.street_view.grid(row=0, column=1)
         self.toolbox.grid(row=0, column=2, sticky="W")
-        self.input_parser = InputParser(self.street_view.street_data)
+        self.input_parser = InputParser(self.street_view.street_data, self.street_view)
 
         # Register events
         self.input_parser.add_crossing += self.street_view.on_new_crossing
         self.input_parser.delete_crossing += self.street_view.street_data.delete
         def connect_streets(c1, c2):
-            c1.connect_both_ways(c2, 1)
+            c1.connect_both_ways_same(c2, 1)
             print("connected streets", c1._connected, c2._connected)
 
         # Export functionality
         self.toolbox.on_export += self.street_view.street_data.export_to_json
         self.input_parser.add_street += connect_streets
-        # self.input_parser.add_crossing += self.street_view.expand_street_arc
         self.input_parser.select_crossing += lambda crossing: self.item_editor.display(crossing)
         self.input_parser.unselect_crossing += lambda *_: self.item_editor.clear()
         self.toolbox.tool_changed += self.input_parser.on_tool_change
     
-        self.street_view.bind("<Button-1>", self.input_parser.parse_mouse_left)
+        def on_mouse_left(event):
+            # a single click can add a crossing and two streets at once,
+            # only redraw the canvas after all of them are done
+            self.street_view._begin_batch()
+            try:
+                self.input_parser.parse_mouse_left(event)
+            finally:
+                self.street_view._end_batch()
+
+        self.street_view.bind("<Button-1>", on_mouse_left)
         self.street_view.bind("<Button-2>", self.input_parser.parse_mouse_right)
         self.street_view.bind("<Motion>", self.input_parser.on_mouse_move)
         self.street_view.bind("<ButtonRelease-1>", self.input_parser.on_left_release)
 
+def batched(method):
+    """Decorator that runs a method of StreetView inside a batch of canvas edits"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._begin_batch()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._end_batch()
+    return wrapper
+
+
 class StreetView(tkinter.Canvas):
+    # crossings are drawn as circles of this diameter
+    CROSSING_SIZE = 10
+    CROSSING_RADIUS = CROSSING_SIZE / 2
+
     def __init__(self, master):
         super().__init__(master, width=800, height=500)
-        self.street_data = StreetData()
+        self.street_data = StreetData(master=self)
         self.street_data.draw_crossing += self.draw_crossing
         self.street_data.delete_crossing += self.delete_crossing
         self.street_data.draw_street += self.draw_street
@@ -59,55 +85,136 @@ class StreetView(tkinter.Canvas):
         # A dictionary that hold everything that is drawn on the screen
         # is used to later delete/redraw streets, crossings etc. 
         # crossings are used as keys themselves
-        # streets are saved in the format (c1, c2)
         self._graphics_objects = {}
-    
-    def expand_street_arc(self, street, x, y):
-        if not len(street.points) >= 4: return
+        # The lines of the streets are saved in the format {c1: {c2: line}}
+        # for a street c1 -> c2, so no tuples have to be hashed per redraw
+        self._street_lines = {}
 
-        if not street.arc:
-            street.arc = self.create_line(*street.points)
-        else:
-            self.coords(street.arc,
-                *street.points
-            )
+        # Redraws of already existing items are coalesced and only
+        # applied once the event loop is idle. Dragging a crossing
+        # produces far more motion events than frames, so only the
+        # latest position needs to reach the canvas.
+        # the ids of the canvas items are used as keys, crossings that
+        # are not drawn yet are keys themselves
+        self._dirty = {}
+        self._redraw_pending = False
+        # While > 0, queued redraws are held back until _end_batch
+        self._batch_depth = 0
+        # (x, y, color) of every crossing as it is currently drawn
+        self._drawn_state = {}
     
+    @batched
     def on_new_crossing(self, c):
-        self.draw_crossing(c)
         self.street_data.add(c)
+        self.draw_crossing(c)
         return c
         
 
+    def _schedule_redraw(self, key, func, *args):
+        """Queues FUNC to be called once the event loop is idle
+
+        If KEY is already queued, only the latest call is kept"""
+
+        self._dirty[key] = (func, args)
+        if not self._redraw_pending and not self._batch_depth:
+            self._redraw_pending = True
+            self.after_idle(self._flush_redraw)
+
+    def _flush_redraw(self):
+        """Applies all queued redraws"""
+
+        dirty, self._dirty = self._dirty, {}
+        self._redraw_pending = False
+        for func, args in dirty.values():
+            func(*args)
+
+    def _begin_batch(self):
+        """Starts a batch of canvas edits (can be nested)"""
+
+        self._batch_depth += 1
+
+    def _end_batch(self):
+        """Ends a batch of canvas edits
+
+        When the outermost batch ends, all queued redraws are applied
+        and the canvas is redrawn once"""
+
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._flush_redraw()
+            self.update_idletasks()
+
     def draw_crossing(self, crossing):
-        x, y = crossing.position
-        oval_size = 10 
-        color = "green" if crossing.is_io_node else "red" 
-        if crossing in self._graphics_objects:
-            self.coords(self._graphics_objects[crossing],
-                x - oval_size/2, y - oval_size/2,
-                x + oval_size/2, y + oval_size/2,
-            )
-            self.itemconfig(self._graphics_objects[crossing],
-                fill=color)
+        g_obj = self._graphics_objects.get(crossing)
+        if g_obj is not None:
+            if g_obj not in self._dirty and self._drawn_state[crossing] == (
+                *crossing.position_xy, self._crossing_color(crossing)
+            ):
+                # nothing changed, e.g. an edit that set the same value again
+                return
+            self._schedule_redraw(g_obj, self._update_crossing, crossing)
+        elif self._batch_depth:
+            # drawn once the batch ends, with the final position and color
+            self._schedule_redraw(crossing, self._create_crossing, crossing)
         else:
-            self._graphics_objects[crossing] = self.create_oval(
-                x - oval_size/2, y - oval_size/2,
-                x + oval_size/2, y + oval_size/2,
-                fill= color            )
+            self._create_crossing(crossing)
+
+    @staticmethod
+    def _crossing_color(crossing):
+        return "green" if crossing.is_io_node else "red"
+
+    def _create_crossing(self, crossing):
+        x, y = crossing.position_xy
+        color = self._crossing_color(crossing)
+        self._drawn_state[crossing] = (x, y, color)
+        r = StreetView.CROSSING_RADIUS
+        bbox = (x - r, y - r, x + r, y + r)
+        self._graphics_objects[crossing] = self.create_oval(*bbox, fill=color)
+
+    def _update_crossing(self, crossing):
+        x, y = crossing.position_xy
+        color = self._crossing_color(crossing)
+        old_x, old_y, old_color = self._drawn_state[crossing]
+        g_obj = self._graphics_objects[crossing]
+        # the circle keeps its size, so it only has to be moved
+        if x != old_x or y != old_y:
+            self.move(g_obj, x - old_x, y - old_y)
+        if color != old_color:
+            self.itemconfig(g_obj, fill=color)
+        self._drawn_state[crossing] = (x, y, color)
     
     def delete_crossing(self, crossing):
         print("Deleting crossing: ", crossing)
-        g_obj = self._graphics_objects.pop(crossing)
-        self.delete(g_obj)
+        self._dirty.pop(crossing, None)
+        self._drawn_state.pop(crossing, None)
+        g_obj = self._graphics_objects.pop(crossing, None)
+        if g_obj is not None:
+            self._dirty.pop(g_obj, None)
+            self.delete(g_obj)
+        # the streets were already deleted by delete_street
+        self._street_lines.pop(crossing, None)
     
     def draw_street(self, c1, c2, lanes):
         # Ignore lanes for now
-        if (c1, c2) in self._graphics_objects:
-            line = self._graphics_objects[(c1, c2)]
-            self.coords(line, *c1.position, *c2.position)
+        lines = self._street_lines.get(c1)
+        line = lines.get(c2) if lines else None
+        if line is not None:
+            self._schedule_redraw(line, self._update_line, line, c1, c2)
         else:
-            line = self.create_line(*c1.position, *c2.position)
-            self._graphics_objects[(c1, c2)] = line
+            self._ensure_line(c1, c2)
+
+    def _ensure_line(self, c1, c2):
+        """Creates the line for the street c1 -> c2"""
+
+        lines = self._street_lines.get(c1)
+        if lines is None:
+            lines = self._street_lines[c1] = {}
+        lines[c2] = self.create_line(*c1.position_xy, *c2.position_xy)
+
+    def _update_line(self, line, c1, c2):
+        """Moves an existing LINE to the current position of c1 and c2"""
+
+        self.coords(line, *c1.position_xy, *c2.position_xy)
     
     def delete_street(self, c1, c2):
         """Deletes a street c1 -> c2. 
@@ -116,9 +223,11 @@ class StreetView(tkinter.Canvas):
         
         print("Delete: ", (c1, c2))
 
-        if (c1, c2) in self._graphics_objects:
-            g_obj = self._graphics_objects.pop((c1, c2))
-            self.delete(g_obj)
+        lines = self._street_lines.get(c1)
+        if lines and c2 in lines:
+            line = lines.pop(c2)
+            self._dirty.pop(line, None)
+            self.delete(line)
     
 
 
@@ -1,7 +1,17 @@
 import tkinter
+import logging
+import weakref
 from event import Event
 
+logger = logging.getLogger(__name__)
+
 class EditableField:
+    # one EditableField is created for every editable value (and every
+    # list element), so they are kept without an instance dict
+    __slots__ = (
+        "name", "var", "readonly", "event", "range", "step", "slider", "__weakref__"
+    )
+
     def __init__(self, var, readonly=False, name="", event=None, range_=(-5, 5), step=None, slider=False):
         self.name = name
         self.var = var
@@ -18,118 +28,250 @@ class EditableField:
 
     @staticmethod
     def from_list(items: list, *args, **kwargs):
-        """Recursively turns all list items into EditableField"""
-        print("regenerating: ", items)
+        """Turns all list items into EditableField, nested lists included
+
+        Nested lists are walked with an explicit stack instead of
+        recursive calls. If the list didn't change since from_list was
+        last called with it and the same arguments, that result is returned"""
+
+        cache = items._fields_cache if isinstance(items, EditableList) else None
+        if cache is not None:
+            version, cached_args, cached_kwargs, field_ref = cache
+            if (version == items._version and cached_args == args
+                    and cached_kwargs == kwargs):
+                field = field_ref()
+                if field is not None:
+                    return field
+        logger.debug("regenerating: %s", items)
 
-        new_items = EditableList()
         nargs = [arg for arg in args if arg != "name"]
         nkwargs = {k: v for k, v in kwargs.items() if k != "name"}
-        
-        for i, item in enumerate(items):
-            if isinstance(item, EditableList):
-                new_items.append(
-                    EditableField.from_list(item,
-                    name=f"# {i}",
-                    *nargs,
-                    **nkwargs
-                ))
-            else:
-                new_items.append(
-                    EditableField(
-                        item,
-                        name=f"# {i}",
-                        *nargs,
-                        **nkwargs
+
+        new_items = EditableList()
+        # pairs of (list to convert, list receiving the EditableFields)
+        stack = [(items, new_items)]
+        while stack:
+            src, dst = stack.pop()
+            for i, item in enumerate(src):
+                if isinstance(item, EditableList):
+                    children = EditableList()
+                    dst.append(
+                        EditableField(
+                            children,
+                            name=f"# {i}",
+                            *nargs,
+                            **nkwargs
+                        )
+                    )
+                    stack.append((item, children))
+                else:
+                    dst.append(
+                        EditableField(
+                            item,
+                            name=f"# {i}",
+                            *nargs,
+                            **nkwargs
+                        )
                     )
-                )
-        def generate_new_child(new, delete):
-            if not delete:
+            EditableField._bind_list_changes(src, dst, nargs, nkwargs)
+
+        field = EditableField(new_items, *args, **kwargs)
+        if isinstance(items, EditableList):
+            # only referenced weakly, the list must not keep its mirror alive
+            items._fields_cache = (items._version, args, kwargs, weakref.ref(field))
+        return field
+
+    @staticmethod
+    def _bind_list_changes(items, new_items, nargs, nkwargs):
+        """Keeps NEW_ITEMS up to date when elements of ITEMS are added or removed"""
+
+        def generate_new_child(new, delete=False, batch=False):
+            if batch:
+                # apply all changes first, so the observers of new_items
+                # are notified only once as well
+                with new_items:
+                    for el, el_delete in new:
+                        generate_new_child(el, el_delete)
+            elif not delete:
+                # appended elements are named like the ones from from_list
+                name = f"# {len(new_items)}"
                 if isinstance(new, list):
-                    new_items.append(EditableField.from_list(new, *nargs, **nkwargs))
+                    # only nested lists need their own subtree
+                    new_items.append(
+                        EditableField.from_list(new, *nargs, name=name, **nkwargs)
+                    )
                 else:
-                    new_items.append(EditableField(new, *nargs, **nkwargs))
+                    new_items.append(EditableField(new, *nargs, name=name, **nkwargs))
             else:
                 new_items.pop(new)
-        
-        items.event += generate_new_child
-        # if isinstance(items, EditableList):
-        #     new_items.event = items.event
-        
 
-        return EditableField(new_items, *args, **kwargs)
+        # ITEMS only holds the observer weakly, it lives as long as the
+        # mirrored list. Otherwise every mirror that was generated once
+        # would be kept alive (and updated) as long as ITEMS exists
+        new_items._mirror_observer = generate_new_child
+        items.event.bind(generate_new_child, weak=True)
 
 
-n = 0
 class EditableList(list):
+    __slots__ = (
+        "event", "_pending", "_batch_depth", "_mirror_observer",
+        "_version", "_fields_cache"
+    )
+
     def __init__(self, *args, event=None):
-        global n
         list.__init__(self, args)
         # Is called when an element is added or removed
         # if removed delete is set to true and the first argument is an index
-        self.event = event if event else Event(name=f'on_list_edit{n}')
-                
-        # Make sure to call the event if something changes
-        def _on_change_wrapper(self, func):
-            def notify(*args, **kwargs):
-                # print(args, kwargs)
-                result = func(self, *args, **kwargs) 
-
-                if self.event:
-                    print(self.event.name, "exisitert",
-                    self.event._observer_funcs, func.__name__)
-                    self.event.notify(self)
-                return result
-            return notify
-        # Bind functions 
-        # TODO: Make special wrappers for iadd, imul etc.
-        # self.extend = _on_change_wrapper(self, list.extend)
-        # self.append = _on_change_wrapper(self, list.append)
-        # self.remove = _on_change_wrapper(self, list.remove)
-        # self.pop = _on_change_wrapper(self, list.pop)
-        # self.__delitem__ = _on_change_wrapper(self, list.__delitem__)
-        # self.__setitem__ = _on_change_wrapper(self, list.__setitem__)
-        # self.__iadd__ = _on_change_wrapper(self, list.__iadd__)
-        # self.__imul__ = _on_change_wrapper(self, list.__imul__)
-        n += 1
+        self.event = event if event else Event(name=f'on_list_edit{id(self):x}')
+        # Changes collected while the list is used as a context manager.
+        # The observers are then notified once with a list of
+        # (element, delete) tuples and batch=True
+        self._pending = None
+        self._batch_depth = 0
+        # Keeps this list up to date if it mirrors another EditableList,
+        # see EditableField.from_list
+        self._mirror_observer = None
+        # Increased on every change. EditableField.from_list stores its
+        # last result in _fields_cache together with the version it was
+        # created for
+        self._version = 0
+        self._fields_cache = None
+
+    @classmethod
+    def from_iterable(cls, iterable, event=None):
+        """Creates a list with the elements of ITERABLE
+
+        Unlike EditableList(*iterable), the elements are not unpacked into
+        arguments first. No change event is sent for them"""
+
+        new = cls(event=event)
+        list.extend(new, iterable)
+        return new
+
+    def __enter__(self):
+        self._batch_depth += 1
+        if self._pending is None:
+            self._pending = []
+        return self
+
+    def __exit__(self, *exc_info):
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            pending, self._pending = self._pending, None
+            if pending:
+                self.event.notify(pending, batch=True)
+
+    def _notify(self, el, delete):
+        self._version += 1
+        if self._pending is not None:
+            self._pending.append((el, delete))
+        else:
+            self.event.notify(el, delete=delete)
+
+    def _notify_replaced(self, old_len):
+        """Reports that all OLD_LEN elements were replaced by the current ones
+
+        There is no event for elements that replace or move others, so
+        the observers are notified once with a batch that pops every old
+        element from the back and appends all current elements again"""
+
+        self._version += 1
+        with self:
+            self._pending.extend((i, True) for i in reversed(range(old_len)))
+            self._pending.extend((el, False) for el in self)
+
+    # The mutating methods are overridden on the class itself, so they
+    # are only created once instead of being rebound for every instance
 
     def extend(self, n_elements):
         """special wrapper for extend
         
         When extend is called, the list has to check if the new elements are editable lists 
         as well to make sure the callback is invoked if necessary"""
-        
-        # for el in n_elements:
-        #     if isinstance(el, EditableList):
-        #         el.event += lambda c_els: self.event.notify(self)
 
+        n_elements = list(n_elements)
         list.extend(self, n_elements) 
-        for el in n_elements:
-            self.event.notify(el, delete=False)
+        self._version += 1
+        # all new elements are reported in a single notification
+        with self:
+            self._pending.extend((el, False) for el in n_elements)
     
     def append(self, n_element):
         """special wrapper for append 
         
         When append is called, the list has to check if the new element is an editable list 
         to make sure the callback is invoked if necessary"""
-        
-        # if isinstance(n_element, EditableList):
-        #     n_element.event += lambda c_els: self.event.notify(self)
 
         list.append(self, n_element) 
-        self.event.notify(n_element, delete=False)
+        self._notify(n_element, False)
 
     def pop(self, i):
         el = list.pop(self, i)
-        self.event.notify(i, delete=True)
+        self._notify(i, True)
         return el
 
     def remove(self, el):
-        i = self.index(el)
-        self.pop(i)
+        # the identity check skips comparing the elements of nested
+        # lists by value when the list itself is removed
+        for i, x in enumerate(self):
+            if x is el or x == el:
+                list.pop(self, i)
+                self._notify(i, True)
+                return
+        raise ValueError("EditableList.remove(x): x not in list")
+
+    def __iadd__(self, n_elements):
+        # list.__iadd__ doesn't call extend
+        self.extend(n_elements)
+        return self
+
+    def __delitem__(self, i):
+        old_len = len(self)
+        list.__delitem__(self, i)
+        if isinstance(i, slice):
+            self._notify_replaced(old_len)
+        else:
+            self._notify(i, True)
+
+    def clear(self):
+        n = len(self)
+        list.clear(self)
+        self._version += 1
+        # reported like popping every element from the back
+        with self:
+            self._pending.extend((i, True) for i in reversed(range(n)))
+
+    # These replace or move elements, see _notify_replaced
+
+    def __setitem__(self, i, n_element):
+        old_len = len(self)
+        list.__setitem__(self, i, n_element)
+        self._notify_replaced(old_len)
+
+    def __imul__(self, n):
+        old_len = len(self)
+        list.__imul__(self, n)
+        self._notify_replaced(old_len)
+        return self
+
+    def insert(self, i, n_element):
+        old_len = len(self)
+        list.insert(self, i, n_element)
+        self._notify_replaced(old_len)
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._notify_replaced(len(self))
+
+    def reverse(self):
+        list.reverse(self)
+        self._notify_replaced(len(self))
 
     def __getitem__(self,item):
         if isinstance(item,slice):
-            return self.__class__(list.__getitem__(self,item))
+            # the elements of the slice, not the slice itself, are the
+            # elements of the new list
+            return self.from_iterable(list.__getitem__(self,item))
         else:
             return list.__getitem__(self,item)
 
@@ -137,23 +279,43 @@ class EditableList(list):
 
 class Editable:
     """A class that can be inherited to automatically generate input fields in the UI"""
+
+    __slots__ = ("_marked_fields", "_marked_fields_tuple")
     
     def __init__(self):
+        # the EditableFields the editor should display, in order
         self._marked_fields = []
+        # marked_fields as a tuple, None when fields were marked since
+        # it was created last
+        self._marked_fields_tuple = None
 
-    def mark_editable(self, var, *args, **kwargs):
+    @property
+    def marked_fields(self):
+        """The marked fields as a tuple
 
-        new_editable = None
+        Is read on every redraw of the editor, so the tuple is only
+        built again after new fields were marked"""
 
+        fields = self._marked_fields_tuple
+        if fields is None:
+            fields = self._marked_fields_tuple = tuple(self._marked_fields)
+        return fields
+
+    def mark_editable(self, var, *args, **kwargs):
         if isinstance(var, EditableList):
             new_editable = EditableField.from_list(var, *args, **kwargs)
         else:
             new_editable = EditableField(var, *args, **kwargs)
         self._marked_fields.append(new_editable)
+        self._marked_fields_tuple = None
 
-    @property
-    def marked_fields(self):
-        return self._marked_fields
+    def freeze(self):
+        """Builds the tuple of marked fields right away
+
+        Should be called once all fields are marked, so the tuple doesn't
+        have to be built on the first redraw of the editor"""
+
+        self._marked_fields_tuple = tuple(self._marked_fields)
     
 if __name__ == "__main__":
     import logging
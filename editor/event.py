@@ -1,34 +1,116 @@
+import inspect
 import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+class _WeakObserver:
+    """Calls an observer that is only referenced weakly
+
+    If FUNC is None, REF references the observer itself. Otherwise it
+    references the object FUNC is a method of"""
+
+    __slots__ = ("ref", "func")
+
+    def __init__(self, ref, func=None):
+        self.ref = ref
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        obj = self.ref()
+        if obj is None:
+            # collected, but not pruned yet
+            return
+        if self.func is None:
+            obj(*args, **kwargs)
+        else:
+            self.func(obj, *args, **kwargs)
+
+    @property
+    def __name__(self):
+        func = self.func if self.func is not None else self.ref()
+        return getattr(func, "__name__", repr(func))
+
 
 class Event:
     """A simple class to implement a (kind of) Observer pattern"""
 
+    __slots__ = ("_observer_funcs", "_log", "name")
+
     def __init__(self, log=True, name=None):
         assert isinstance(log, bool)
-        self._observer_funcs = []
+        # Used as an insertion ordered set, so an observer can be
+        # removed without searching through all of them.
+        # Maps every observer to the function that is called, which is
+        # the observer itself or a _WeakObserver if it is referenced weakly.
+        # Only created on the first bind, most events never get any observers
+        self._observer_funcs = None
         self._log = log 
         self.name = name if name else self
 
 
-    def bind(self, *funcs):
+    def bind(self, *funcs, weak=False):
+        """Binds FUNCS to the event
+
+        Bound methods are only referenced weakly if their object supports
+        it, so binding them does not keep their object alive. If WEAK is set, plain functions are
+        referenced weakly as well, and the caller has to keep them alive.
+        Observers that were garbage collected are unbound automatically."""
+
         assert min(callable(f) for f in funcs), "Observers must be callable"
-        self._observer_funcs.extend(funcs)
-        if self._log:
+        if self._observer_funcs is None:
+            self._observer_funcs = {}
+        observers = self._observer_funcs
+        for func in funcs:
+            key = self._key(func, weak)
+            # removes the observer once it is garbage collected
+            prune = lambda _, key=key: observers.pop(key, None)
+            try:
+                if inspect.ismethod(func):
+                    # the bound method itself is a temporary object, so only
+                    # its object is referenced weakly
+                    observers[key] = _WeakObserver(
+                        weakref.ref(func.__self__, prune), func.__func__
+                    )
+                elif weak:
+                    observers[key] = _WeakObserver(weakref.ref(func, prune))
+                else:
+                    observers[key] = func
+            except TypeError:
+                # can't be referenced weakly, e.g. a method of an object
+                # with __slots__ but without __weakref__
+                observers[key] = func
+        if self._log and logger.isEnabledFor(logging.DEBUG):
             for func in funcs:
-                logging.debug(
-                    f"Bound '{func.__name__}' to event '{self.name}'"
+                logger.debug(
+                    "Bound '%s' to event '%s'", func.__name__, self.name
                 )
 
     def unbind(self, *funcs):
+        observers = self._observer_funcs or {}
         for func in funcs:
+            key = func if func in observers else self._key(func, True)
             try:
-                self._observer_funcs.remove(func)
+                del observers[key]
                 if self._log:
-                    logging.debug(
-                        f"Removed binding of '{func.__name__}' to event '{self.name}'"
+                    logger.debug(
+                        "Removed binding of '%s' to event '%s'",
+                        func.__name__, self.name
                     )
-            except ValueError:
+            except KeyError:
                 continue
+
+    @staticmethod
+    def _key(func, weak):
+        """Returns the key FUNC is stored with in _observer_funcs"""
+
+        if inspect.ismethod(func):
+            # bound methods are created anew on every attribute access
+            return (id(func.__self__), func.__func__)
+        if weak:
+            return (id(func), None)
+        return func
+
     def __iadd__(self, func):
         self.bind(func)
         return self
@@ -40,9 +122,19 @@ class Event:
     def notify(self, *args, **kwargs):
         """Calls all observer functions"""
 
-        for f in self._observer_funcs:
-            f(*args, **kwargs)
-            if self._log:
-                logging.debug(
-                    f"Notified observer '{f.__name__}' of event '{self.name}'"
+        funcs = self._observer_funcs
+        if not funcs:
+            return
+        # iterate over a copy, observers may unbind themselves
+        # while they are notified
+        funcs = tuple(funcs.values())
+        if self._log and logger.isEnabledFor(logging.DEBUG):
+            name = self.name
+            for f in funcs:
+                f(*args, **kwargs)
+                logger.debug(
+                    "Notified observer '%s' of event '%s'", f.__name__, name
                 )
+        else:
+            for f in funcs:
+                f(*args, **kwargs)
@@ -4,12 +4,22 @@ from event import Event
 
 
 class InputParser:
-    def __init__(self, street_data: StreetData):
+    # number of clicked positions whose nearest crossing is remembered
+    NEAREST_CACHE_SIZE = 32
+    # clicks at most this far away from a crossing hit it
+    PICK_RADIUS = 50 ** 0.5
+
+    def __init__(self, street_data: StreetData, master=None):
+        """MASTER is a widget used to schedule work for when the event
+        loop is idle. Without it, mouse movements are handled immediately"""
+
         self.street_data = street_data
+        self.master = master
         self.add_crossing = Event(name="add_crossing")
         self.add_street = Event(name="add_street")
         self.delete_crossing = Event(name="delete_crossing")
-        self.move_crossing = Event(name="move_crossing")
+        # notified on every mouse movement while dragging, so not logged
+        self.move_crossing = Event(log=False, name="move_crossing")
         self.select_crossing = Event(name="select_crossing")
         self.unselect_crossing = Event(name="unselect_crossing")
         # TODO: Find a better way to synchronise this with the
@@ -20,49 +30,99 @@ class InputParser:
         self.selected_tool = Tool.SELECTION
         self.selected = None
         self.dragging = None
+        # latest mouse position while dragging that was not applied yet
+        self._pending_move = None
+        # results of get_nearest for recently clicked positions in the
+        # format {(x, y): (dist, crossing)}, only valid as long as
+        # street_data.version is _nearest_cache_version. The version
+        # changes as soon as a crossing is moved, even if its redraw
+        # is still pending
+        self._nearest_cache = {}
+        self._nearest_cache_version = street_data.version
     
     def parse_mouse_left(self, event):
+        # a single click can notify several events, so the notify
+        # methods are only looked up once
+        select = self.select_crossing.notify
+        unselect = self.unselect_crossing.notify
+        add_street = self.add_street.notify
         if self.selected_tool == Tool.ADD:
-            dist, sel = self.street_data.get_nearest(event.x, event.y)
-            if dist and dist <= 50:
-                self.unselect_crossing.notify(self.selected)
-                self.add_street.notify(self.selected, sel)
+            _, sel = self._get_nearest(event.x, event.y)
+            if sel is not None:
+                unselect(self.selected)
+                add_street(self.selected, sel)
                 self.selected = sel
-                self.select_crossing.notify(sel)
+                select(sel)
             else:
                 c = Crossing([event.x, event.y])
                 self.add_crossing.notify(c)
                 if self.selected:
-                    self.unselect_crossing.notify(self.selected)
-                    self.add_street.notify(self.selected, c)
-                self.select_crossing.notify(c)
+                    unselect(self.selected)
+                    add_street(self.selected, c)
+                select(c)
                 self.selected = c
         elif self.selected_tool == Tool.SELECTION:
-            dist, sel = self.street_data.get_nearest(event.x, event.y)
-            if dist and dist <= 50:
+            _, sel = self._get_nearest(event.x, event.y)
+            if sel is not None:
                 if sel != self.selected:
-                    self.unselect_crossing.notify(self.selected)
-                    self.select_crossing.notify(sel)
+                    unselect(self.selected)
+                    select(sel)
                     self.selected = sel
                 self.dragging = sel
         elif self.selected_tool == Tool.DELETION:
-            dist, crossing = self.street_data.get_nearest(event.x, event.y)
-            if dist and dist <= 50:
+            _, crossing = self._get_nearest(event.x, event.y)
+            if crossing is not None:
                 if self.selected == crossing:
                     self.selected = None
-                    self.unselect_crossing.notify(crossing)
+                    unselect(crossing)
                 self.delete_crossing.notify(crossing)
 
                     
             
+    def _get_nearest(self, x, y):
+        """Same as StreetData.get_nearest with PICK_RADIUS, but cached"""
+
+        version = self.street_data.version
+        if version != self._nearest_cache_version:
+            # crossings were added, deleted or moved since
+            self._nearest_cache.clear()
+            self._nearest_cache_version = version
+        key = (x, y)
+        result = self._nearest_cache.get(key)
+        if result is None:
+            if len(self._nearest_cache) >= InputParser.NEAREST_CACHE_SIZE:
+                self._nearest_cache.clear()
+            result = self._nearest_cache[key] = self.street_data.get_nearest(
+                x, y, InputParser.PICK_RADIUS
+            )
+        return result
+
     def on_left_release(self, event):
+        # apply the last position before the crossing is dropped
+        self._flush_move()
         self.dragging = None
             
     
     def on_mouse_move(self, event):
         if self.dragging:
-            self.selected.position = [event.x, event.y]
-            self.move_crossing.notify(self.dragging, event.x, event.y)
+            # Tk reports motion much more often than the screen is
+            # redrawn, so only the latest position per idle tick is applied
+            scheduled = self._pending_move is not None
+            self._pending_move = (event.x, event.y)
+            if self.master is None:
+                self._flush_move()
+            elif not scheduled:
+                self.master.after_idle(self._flush_move)
+
+    def _flush_move(self):
+        """Moves the dragged crossing to the latest mouse position"""
+
+        pos, self._pending_move = self._pending_move, None
+        if pos is None or not self.dragging:
+            return
+        x, y = pos
+        self.dragging.position = [x, y]
+        self.move_crossing.notify(self.dragging, x, y)
 
     def parse_mouse_right(self, event):
         pass
@@ -3,7 +3,8 @@ import enum
 from editable import Editable, EditableField, EditableList
 from street_data import Crossing
 import logging
-from event import Event
+
+logger = logging.getLogger(__name__)
 
 class ItemEditor(tkinter.LabelFrame):
     """An editor for editing e.g. Crossings
@@ -11,26 +12,91 @@ class ItemEditor(tkinter.LabelFrame):
     This frame is recursive and can display fields that are
     Editables themselves"""
 
-    def __init__(self, master, name="", _parents=[]):
+    # minimal width of the column holding the names of the fields
+    LABEL_COLUMN_WIDTH = 120
+
+    def __init__(self, master, name="", _parents=None):
         """General design choices"""
         
         super().__init__(master, text=name)
+        # the columns are sized up front, so placing a row doesn't make
+        # Tk negotiate the width of the label column again
+        self.grid_columnconfigure(0, weight=0, minsize=ItemEditor.LABEL_COLUMN_WIDTH)
+        self.grid_columnconfigure(1, weight=1)
 
-        # holds a reference to all the widgets
+        # holds a reference to all the widgets, as one tuple per row:
+        # (label, widget), or (editor,) for nested ItemEditors, which
+        # span both columns
         self._displayed_items = []
-        self._parents = _parents
+        # id() of the field displayed in the same row of _displayed_items
+        self._displayed_keys = []
+        # The widgets of the fields that were displayed last, in the
+        # format {id(field): (field, widgets)}. They are kept after
+        # clear(), so displaying the same item again (e.g. when it is
+        # reselected) reuses them instead of building them again.
+        self._widget_cache = {}
+        # {id(field): callback}, run when the widgets of a field are destroyed
+        self._teardown = {}
+        # Widgets of fields that aren't displayed anymore, in the format
+        # {widget class: [widget, ...]}. They are configured for new fields
+        # instead of creating new widgets, see _acquire. _poolable holds
+        # all widgets that were created by _acquire
+        self._pool = {}
+        self._poolable = set()
+        # set of the types of the Editables this editor is nested in,
+        # copied so nested editors never share (and clear) their parents' set
+        self._parents = set(_parents) if _parents else set()
         self._name = name
+        # on_list_change only redraws once per idle tick, with the list
+        # it was called with last. The mirror of that list is kept in
+        # _list_field as (list, EditableField), so the same fields and
+        # therefore the cached widgets are reused on every redraw
+        self._changed_list = None
+        self._list_redraw_pending = False
+        self._list_field = None
         self._empty_placeholder = tkinter.Label(self, text="No widgets") 
         self._empty_placeholder.grid(row=0, column=0)
-        self._on_clear = Event(name="on_clear")
 
     def on_list_change(self, nlist):
         """Is called when the ItemEditor is displaying a list and the list changes"""
         
-        print("redrawing: ", nlist)
+        self._changed_list = nlist
+        if not self._list_redraw_pending:
+            self._list_redraw_pending = True
+            self.after_idle(self._redraw_list)
+
+    def _on_list_item_change(self, el, delete=False, batch=False):
+        """Is bound to the event of the EditableList the editor displays
+
+        Only adds or removes the rows of the changed elements"""
+
+        if batch:
+            for change in el:
+                self._on_list_item_change(*change)
+        elif delete:
+            self.remove_field(el)
+        else:
+            if isinstance(el, EditableField):
+                # the list of fields generated by from_list
+                field = el
+            elif isinstance(el, EditableList):
+                field = EditableField.from_list(el)
+            else:
+                field = EditableField(el) 
+            self.add_field(field)
+
+    def _redraw_list(self):
+        """Displays the list on_list_change was called with last"""
+
+        nlist, self._changed_list = self._changed_list, None
+        self._list_redraw_pending = False
+        logger.debug("redrawing: %s", nlist)
+        if self._list_field is None or self._list_field[0] is not nlist:
+            # the mirror keeps itself up to date, it only has to be
+            # created once per list
+            self._list_field = (nlist, EditableField.from_list(nlist))
         self.clear()
-        new_editable_fields = EditableField.from_list(nlist)
-        self.display([new_editable_fields])
+        self.display([self._list_field[1]])
 
     
     def display(self, item):
@@ -41,40 +107,116 @@ class ItemEditor(tkinter.LabelFrame):
         
         if isinstance(item, Editable):
             marked_fields = item.marked_fields
-            self._parents.append(type(item))
+            self._parents.add(type(item))
         else:
             marked_fields = item
 
+        # cached widgets that are not displayed anymore and are not
+        # reused now are released first, so the new fields can use them
+        unused = set(self._widget_cache).difference(
+            self._displayed_keys, map(id, marked_fields)
+        )
+        for key in unused:
+            self._destroy_field_widgets(key)
+        first_row = len(self._displayed_items)
         for field in marked_fields:
-            widgets = self._generate_widget(field)
-            start = len(self._displayed_items)
-            for i, w in enumerate(widgets):
-                if isinstance(w, ItemEditor):
-                    self._displayed_items.append(w)
-                    w.grid(row=start+i, column=0, columnspan=2)
-                else:
-                    label = tkinter.Label(self, text=field.name)
-                    label.grid(row=start+i, column=0)
-                    w.grid(row=start+i, column=1)
-                    self._displayed_items.append((label, w))
+            self._show_field(field, grid=False)
+        # all widgets are placed in one go once they exist, so the
+        # geometry manager isn't interleaved with creating widgets
+        items = self._displayed_items
+        for row in range(first_row, len(items)):
+            self._grid_item(items[row], row)
     
     def clear(self):
-        """Clears all displayed widgets"""
+        """Clears all displayed widgets
+
+        The widgets are only hidden, see display"""
         
-        for w in self._displayed_items:
-            if isinstance(w, tuple):
-                for el in w:
-                    el.grid_forget()
-            else:
+        for widgets in self._displayed_items:
+            for w in widgets:
                 w.grid_forget()
         
         self._displayed_items.clear()
+        self._displayed_keys.clear()
         self._parents.clear()
-        self._last_row = 0
-        self._on_clear.notify()
+
+    def destroy(self):
+        for key in list(self._widget_cache):
+            self._destroy_field_widgets(key)
+        super().destroy()
+
+    def _show_field(self, field: EditableField, grid=True):
+        """Displays FIELD in a new row, reusing cached widgets if possible
+
+        If GRID is False, the widgets are not placed yet"""
+
+        key = id(field)
+        cached = self._widget_cache.get(key)
+        if cached is None:
+            w = self._generate_widget(field)[0]
+            if isinstance(w, ItemEditor):
+                widgets = (w,)
+            else:
+                widgets = (self._acquire(tkinter.Label, text=field.name), w)
+            self._widget_cache[key] = (field, widgets)
+        else:
+            widgets = cached[1]
+        if grid:
+            self._grid_item(widgets, len(self._displayed_items))
+        self._displayed_items.append(widgets)
+        self._displayed_keys.append(key)
+
+    @staticmethod
+    def _grid_item(widgets, row):
+        if len(widgets) == 2:
+            label, widget = widgets
+            label.grid(row=row, column=0)
+            widget.grid(row=row, column=1)
+        else:
+            widgets[0].grid(row=row, column=0, columnspan=2)
+
+    def _destroy_field_widgets(self, key):
+        """Destroys the cached widgets of the field with the id KEY
+
+        Widgets from _acquire are only hidden and put back into the pool"""
+
+        _field, widgets = self._widget_cache.pop(key)
+        teardown = self._teardown.pop(key, None)
+        if teardown:
+            teardown()
+        for w in widgets:
+            if w in self._poolable:
+                w.grid_forget()
+                self._pool.setdefault(type(w), []).append(w)
+            else:
+                w.destroy()
+
+    def _acquire(self, cls, **options):
+        """Returns a widget of the class CLS with OPTIONS
+
+        A released widget of that class is configured with OPTIONS if there
+        is one, because that is much cheaper than creating a new widget.
+        OPTIONS has to set everything that can differ between the widgets
+        of a class"""
+
+        pool = self._pool.get(cls)
+        if pool:
+            w = pool.pop()
+            w.configure(**options)
+            return w
+        w = cls(self, **options)
+        self._poolable.add(w)
+        return w
 
     def _generate_widget(self, field: EditableField):
         new_widgets = [] 
+        # most fields are tkinter variables, so they are looked up first
+        # and skip the isinstance checks below
+        factory = ItemEditor._WIDGET_FACTORIES.get(type(field.var))
+        if factory is not None:
+            new_widgets.append(factory(self, field))
+            return new_widgets
+
         if isinstance(field.var, Editable):
             # prevent infinite recursion
             if type(field.var) in self._parents:
@@ -85,71 +227,25 @@ class ItemEditor(tkinter.LabelFrame):
             else:
                 new_widgets.append(ItemEditor(
                     self,
-                    _parents=self._parents + [type(field.var)]
+                    _parents=self._parents | {type(field.var)}
                 ))
                 new_widgets[-1].display(field.var)
             return new_widgets
         
-        if isinstance(field.var, tkinter.IntVar):
-            new_widgets.append(tkinter.Scale(
-                self,
-                from_=field.range[0],
-                to=field.range[1],
-                variable=field.var,
-                resolution=field.step if field.step else 1,
-                orient=tkinter.HORIZONTAL,
-                length=500
-            ))
-        elif isinstance(field.var, tkinter.StringVar):
-            new_widgets.append(tkinter.Entry(
-                self,
-                textvariable=field.var,
-                state=tkinter.DISABLED if field.readonly else tkinter.NORMAL
-            ))
-        elif isinstance(field.var, tkinter.DoubleVar):
-            new_widgets.append(tkinter.Scale(
-                self,
-                from_=field.range[0],
-                to=field.range[1],
-                resolution=field.step if field.step else 0.01,
-                variable=field.var,
-                orient=tkinter.HORIZONTAL,
-                length=100
-            ))
-        elif isinstance(field.var, tkinter.BooleanVar):
-            # Nice hacky code 
-            
-            check = tkinter.Checkbutton(
-                self,
-                fg="green",
-                variable=field.var,
-                state=tkinter.DISABLED if field.readonly else tkinter.NORMAL
-            )
-
-            new_widgets.append(check)
-        elif isinstance(field.var, EditableList):
-            print("makedy dakedy list", field.name, field.var)
+        if isinstance(field.var, EditableList):
+            logger.debug("displaying list %s: %s", field.name, field.var)
             s = ItemEditor(
                 self,
                 name=field.name,
                 _parents=self._parents
             )
             new_widgets.append(s)
-            # Bind update event from EditableList to rerender
-            def change_el_of_list(el, delete):
-                if delete:
-                    s.remove_field(el)
-                else:
-                    if isinstance(el, EditableList):
-                        field = EditableField.from_list(el)
-                    else:
-                        field = EditableField(el) 
-                    s.add_field(field)
-            def remove_callback():
-                field.var.event -= change_el_of_list
-                self._on_clear -= remove_callback
-            field.var.event += change_el_of_list
-            self._on_clear += remove_callback
+            # Bind update event from EditableList to rerender. A bound
+            # method is only referenced weakly by the event, so the list
+            # doesn't keep the editor alive
+            lst_event = field.var.event
+            lst_event += s._on_list_item_change
+            self._teardown[id(field)] = lambda: lst_event.unbind(s._on_list_item_change)
 
             s.display(field.var)
             self.update()
@@ -162,25 +258,67 @@ class ItemEditor(tkinter.LabelFrame):
             
         return new_widgets
 
+    def _make_int_scale(self, field: EditableField):
+        return self._acquire(
+            tkinter.Scale,
+            from_=field.range[0],
+            to=field.range[1],
+            variable=field.var,
+            resolution=field.step if field.step else 1,
+            orient=tkinter.HORIZONTAL,
+            length=500
+        )
+
+    def _make_entry(self, field: EditableField):
+        return self._acquire(
+            tkinter.Entry,
+            textvariable=field.var,
+            state=tkinter.DISABLED if field.readonly else tkinter.NORMAL
+        )
+
+    def _make_double_scale(self, field: EditableField):
+        return self._acquire(
+            tkinter.Scale,
+            from_=field.range[0],
+            to=field.range[1],
+            resolution=field.step if field.step else 0.01,
+            variable=field.var,
+            orient=tkinter.HORIZONTAL,
+            length=100
+        )
+
+    def _make_checkbutton(self, field: EditableField):
+        # Nice hacky code 
+        return self._acquire(
+            tkinter.Checkbutton,
+            fg="green",
+            variable=field.var,
+            state=tkinter.DISABLED if field.readonly else tkinter.NORMAL
+        )
+
+    # Widgets for the tkinter variables, looked up by the exact type of
+    # the variable instead of going through a chain of isinstance checks
+    _WIDGET_FACTORIES = {
+        tkinter.IntVar: _make_int_scale,
+        tkinter.StringVar: _make_entry,
+        tkinter.DoubleVar: _make_double_scale,
+        tkinter.BooleanVar: _make_checkbutton,
+    }
+
     def add_field(self, field: EditableField):
         self._empty_placeholder.grid_forget()
-        w = self._generate_widget(field)[0]
-        if isinstance(w, ItemEditor):
-            w.grid(row=len(self._displayed_items))
-            self._displayed_items.append(w)
-        else:
-            label = tkinter.Label(self, text=field.name)
-            label.grid(row=len(self._displayed_items), column=0)
-            w.grid(row=len(self._displayed_items), column=1)
-            self._displayed_items.append((label, w))
+        self._show_field(field)
     
     def remove_field(self, i):
-        w = self._displayed_items.pop(i)
-        if isinstance(w, tuple):
-            for el in w:
-                el.grid_forget()
-        else:
-            w.grid_forget()
+        """Removes the widgets of the field in row I, the other rows stay untouched"""
+
+        self._displayed_items.pop(i)
+        self._destroy_field_widgets(self._displayed_keys.pop(i))
+        # move the following rows up, so new fields don't overlap them
+        if i < 0:
+            i += len(self._displayed_items) + 1
+        for row in range(i, len(self._displayed_items)):
+            self._grid_item(self._displayed_items[row], row)
         if not self._displayed_items:
             self._empty_placeholder.grid(row=0, column=0)
 
@@ -233,10 +371,11 @@ if __name__ == "__main__":
             # self.mark_editable(self.f, name="Leeres Ding", readonly=False)
             self.mark_editable(self.crossing1, name="Crossing1", readonly=False)
             self.mark_editable(self.crossing2, name="Crossing2", readonly=False)
+            self.freeze()
             # self.mark_editable(self.f, name="Rekursive liste", range_=(1, 11))
             def on_change(*args):
                 # self.f.append(EditableList(EditableList(self.f), tkinter.IntVar()))
-                self.crossing1.connect_both_ways(self.crossing2, 2)
+                self.crossing1.connect_both_ways_same(self.crossing2, 2)
                 # self.f.append(EditableList(Crossing([1, 2]), tkinter.IntVar(value=1)))
                 # self.c.event += self.item_editor.on_list_change
                 # self.c.event.notify(self)
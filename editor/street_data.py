@@ -5,32 +5,134 @@ from editable import EditableList, Editable
 from tkinter import StringVar, IntVar, DoubleVar, BooleanVar
 import event
 import json
+import struct
+from pprint import pprint
+from array import array
 from tkinter import filedialog
 
 
+# Binary format of StreetData.save: a header holding the number of
+# crossings, followed by one record per crossing, each directly followed
+# by the records of its connections
+_HEADER = struct.Struct("<I")
+# x, y, has traffic lights, is I/O node, number of connections
+_CROSSING_RECORD = struct.Struct("<ii??I")
+# index of the connected crossing, lanes
+_CONNECTION_RECORD = struct.Struct("<II")
+
+
+def _nearest_index(xs, ys, x, y, max_dist_sqr=math.inf):
+    """Returns (index, squared distance) of the point nearest to x, y
+
+    Only points at most sqrt(MAX_DIST_SQR) away are considered, (None, None)
+    is returned if there are none. The distances are computed and compared
+    in a single pass, without building any intermediate lists"""
+
+    best = None
+    best_dist_sqr = max_dist_sqr
+    for i in range(len(xs)):
+        dx = xs[i] - x
+        dx *= dx
+        # far off on the x axis alone, y doesn't matter anymore
+        if dx > best_dist_sqr:
+            continue
+        dy = ys[i] - y
+        dist_sqr = dx + dy*dy
+        if dist_sqr <= best_dist_sqr:
+            best = i
+            best_dist_sqr = dist_sqr
+    if best is None:
+        return None, None
+    return best, best_dist_sqr
+
+
+def _nearest_in_bucket(crossings, x, y, max_dist_sqr):
+    """Returns (squared distance, crossing) of the crossing nearest to x, y
+
+    Only crossings at most sqrt(MAX_DIST_SQR) away are considered,
+    (None, None) is returned if there are none"""
+
+    nearest = None
+    best_dist_sqr = max_dist_sqr
+    for c in crossings:
+        dx = c._px - x
+        dx *= dx
+        if dx > best_dist_sqr:
+            continue
+        dy = c._py - y
+        dist_sqr = dx + dy*dy
+        if dist_sqr <= best_dist_sqr:
+            nearest = c
+            best_dist_sqr = dist_sqr
+    if nearest is None:
+        return None, None
+    return best_dist_sqr, nearest
+
+
+def _ring(gx, gy, r):
+    """Returns the cells at a chebyshev distance of R from the cell gx, gy"""
+
+    if not r:
+        return ((gx, gy),)
+    cells = []
+    for cx in range(gx - r, gx + r + 1):
+        cells.append((cx, gy - r))
+        cells.append((cx, gy + r))
+    for cy in range(gy - r + 1, gy + r):
+        cells.append((gx - r, cy))
+        cells.append((gx + r, cy))
+    return cells
+
+
 class Crossing(Editable):
-    def __init__(self, position: list, connected: list=[], traffic_lights: bool=False, on_pos_change=None, draw_street=None):
+    def __init__(self, position: list, connected: list=None, traffic_lights: bool=False, on_pos_change=None, draw_street=None):
         """class for saving of crossings. connected has to be a
         list in the form of [[crossing, number_of_lanes], [...]]
         """
         Editable.__init__(self)
         self._position = EditableList(IntVar(value=position[0]), IntVar(value=position[1]))
         self.on_pos_change = on_pos_change
+        # notified on every write to the position, unlike on_pos_change
+        # which can be deferred to the next idle tick. Set by StreetData.add
+        self.on_pos_write = None
         self.draw_street = draw_street 
         self.draw_crossing = None
         self.delete_street = None
+        # widget used to notify on_pos_change at most once per idle tick
+        # when the position IntVars are written to (e.g. by a slider in
+        # the editor). Set by StreetData.add, immediately notified if None
+        self.master = None
+        self._pos_change_pending = False
 
-        self._position[0].trace("w", lambda *_: self.on_pos_change.notify(self))
-        self._position[1].trace("w", lambda *_: self.on_pos_change.notify(self))
+        # set while the position setter changes both coordinates, so
+        # on_pos_change is only notified once instead of once per IntVar
+        self._setting_position = False
+        # the position as plain ints, so reading it doesn't need a
+        # round trip to Tcl for every coordinate
+        self._px = self._position[0].get()
+        self._py = self._position[1].get()
+        self._position[0].trace("w", lambda *_: self._on_position_var_change(0))
+        self._position[1].trace("w", lambda *_: self._on_position_var_change(1))
         # TODO: Create setter and getter
         self._connected = EditableList()
+        # crossings that are connected to this one, so that streets
+        # leading here can be found without scanning every crossing
+        self._reverse_connections = set()
+        # the IntVar holding the lanes of every connection in _connected,
+        # with the connected crossing as key. Kept in sync with _connected
+        # by _sync_conn_index, however _connected is changed
+        self._conn_index = {}
+        # the lanes of every connection as plain ints, like _px and _py.
+        # Written to by the traces of the IntVars in _connected
+        self._lanes = {}
+        self._connected.event += self._sync_conn_index
 
         self._is_io_node = BooleanVar(value=False)
         # redraw the node if it becomes an IO node
-        self._is_io_node.trace("w", lambda *_: self.draw_crossing.notify(self))
+        self._is_io_node.trace("w", lambda *_: self._on_io_node_change())
 
-        for c, n in connected:
-            self._connected.append([c, IntVar(n)])
+        for c, n in connected or ():
+            self._make_connection(c, n)
         self._traffic_lights = BooleanVar(value=traffic_lights)
         
         # Mark for the editor
@@ -38,10 +140,18 @@ class Crossing(Editable):
         self.mark_editable(self._connected, name="connected: ", range_=(1, 5))
         self.mark_editable(self._traffic_lights, name="has traffic lights: ")
         self.mark_editable(self._is_io_node, name="is I/O-Node")
+        self.freeze()
 
     @property
     def position(self):
-        return [self._position[0].get(), self._position[1].get()]
+        return [self._px, self._py]
+
+    @property
+    def position_xy(self) -> tuple:
+        """The position as an (x, y) tuple
+
+        Cheaper than position, prefer it where the position is only read"""
+        return (self._px, self._py)
     
     @property
     def is_io_node(self):
@@ -50,14 +160,58 @@ class Crossing(Editable):
     @is_io_node.setter
     def is_io_node(self, n: bool):
         assert isinstance(n, bool)
-        if self.draw_street:
-            self.draw_street.notify(self)
+        # the trace of _is_io_node redraws the crossing
         self._is_io_node.set(n)
 
+    def _on_io_node_change(self):
+        """Is called when _is_io_node is written to"""
+
+        # not drawn before the crossing is added to StreetData
+        if self.draw_crossing:
+            self.draw_crossing.notify(self)
+
     @position.setter
     def position(self, new: list):
-        for i, pos in enumerate(self._position):
-            pos.set(new[i])
+        self._setting_position = True
+        try:
+            for i, pos in enumerate(self._position):
+                pos.set(new[i])
+        finally:
+            self._setting_position = False
+        if self.on_pos_write:
+            self.on_pos_write.notify(self)
+        if self.on_pos_change:
+            self.on_pos_change.notify(self)
+
+    def _on_position_var_change(self, i):
+        """Is called when the position IntVar with the index I is written to"""
+
+        if i:
+            self._py = self._position[1].get()
+        else:
+            self._px = self._position[0].get()
+        if self._setting_position or not self.on_pos_change:
+            # nothing to notify before the crossing is added to StreetData
+            return
+        # things that are looked up by position, like the index of
+        # StreetData.get_nearest, must not wait for the idle tick
+        if self.on_pos_write:
+            self.on_pos_write.notify(self)
+        if self.master is None:
+            self.on_pos_change.notify(self)
+        elif not self._pos_change_pending:
+            self._pos_change_pending = True
+            self.master.after_idle(self._flush_pos_change)
+
+    def _flush_pos_change(self):
+        """Notifies on_pos_change of the writes since the last idle tick"""
+
+        if not self._pos_change_pending:
+            # cancelled, e.g. because the crossing was deleted
+            return
+        self._pos_change_pending = False
+        if self.on_pos_change:
+            self.on_pos_change.notify(self)
 
     @property
     def traffic_lights(self):
@@ -70,27 +224,82 @@ class Crossing(Editable):
 
     def connect(self, other: Crossing, lanes: int):
         """Connects two Crossings, but only one way. if exists, adds lanes"""
-        if not self.is_connected(other):
-            self._connected.append(EditableList(other, IntVar(value=lanes)))
+        lanes_var = self._conn_index.get(other)
+        if lanes_var is None:
+            self._make_connection(other, lanes)
         else:
-            for c, n in self._connected:
-                if c == other:
-                    n.set(n.get()+lanes)
+            lanes_var.set(self._lanes[other]+lanes)
         
         if self.draw_street:
             self.draw_street.notify(self, other, lanes)
 
+    def _make_connection(self, other: Crossing, lanes: int):
+        """Adds a new connection to OTHER with LANES lanes"""
+
+        # _sync_conn_index updates the indices and other._reverse_connections
+        self._connected.append(EditableList(other, IntVar(value=lanes)))
+
+    def _on_lanes_var_change(self, other, lanes_var):
+        """Is called when the IntVar with the lanes to OTHER is written to"""
+
+        # the var of a removed connection may still be written to
+        if self._conn_index.get(other) is lanes_var:
+            self._lanes[other] = lanes_var.get()
+
+    def _sync_conn_index(self, el, delete=False, batch=False):
+        """Is bound to the event of _connected and updates _conn_index,
+        _lanes and the reverse connections of the connected crossings"""
+
+        if delete or batch:
+            # the removed connection isn't known anymore, only its index
+            old_index = self._conn_index
+            self._conn_index = {}
+            self._lanes = {}
+            for other, lanes in self._connected:
+                # the vars that were indexed before already have a trace
+                self._index_connection(other, lanes, old_index.get(other) is lanes)
+            for other in old_index.keys() - self._conn_index.keys():
+                other._reverse_connections.discard(self)
+        else:
+            other, lanes = el
+            self._index_connection(other, lanes)
+
+    def _index_connection(self, other, lanes_var, traced=False):
+        """Adds the connection to OTHER with the lanes in LANES_VAR to the
+        indices. If TRACED is not set, LANES_VAR is traced for _lanes"""
+
+        self._conn_index[other] = lanes_var
+        self._lanes[other] = lanes_var.get()
+        other._reverse_connections.add(self)
+        if not traced:
+            lanes_var.trace(
+                "w", lambda *_: self._on_lanes_var_change(other, lanes_var)
+            )
+
     def connect_both_ways(self, other: Crossing, lanes):
         """Connects two Crossings in both ways. if LANES is a list,
          different amount of lanes in either direction
-        can be specified."""
+        can be specified.
+
+        Prefer connect_both_ways_same and connect_both_ways_asym, which
+        don't have to check the type of LANES"""
         if isinstance(lanes, list):
             assert len(lanes) == 2, "lanes needs to be of type [int, int] or int"
-            lanes1, lanes2 = lanes
+            self.connect_both_ways_asym(other, *lanes)
         else:
             assert isinstance(lanes, int), "lanes needs to be a number"
-            lanes1, lanes2 = lanes, lanes
-        
+            self.connect_both_ways_same(other, lanes)
+
+    def connect_both_ways_same(self, other: Crossing, lanes: int):
+        """Connects two Crossings in both ways with LANES lanes in either direction"""
+
+        self.connect(other, lanes)
+        other.connect(self, lanes)
+
+    def connect_both_ways_asym(self, other: Crossing, lanes1: int, lanes2: int):
+        """Connects two Crossings in both ways, with LANES1 lanes from this
+        crossing to OTHER and LANES2 lanes back"""
+
         self.connect(other, lanes1)
         other.connect(self, lanes2)
 
@@ -99,17 +308,13 @@ class Crossing(Editable):
         
         force: instead of decreasing the lane count, remove completely"""
         
-        # get variable storing the index
         assert isinstance(lanes, int)
-        other_indices = [
-            i for i, (crossing, _) in enumerate(self._connected) if crossing == other
-        ] 
-        if not other_indices:
+        lanes_var = self._conn_index.get(other)
+        if lanes_var is None:
             return
-        i = other_indices[0]
         
-        lanes_var = self._connected[i][1]
-        n_value = lanes_var.get()-min(lanes, lanes_var.get())
+        current = self._lanes[other]
+        n_value = current-min(lanes, current)
 
         if n_value and not force:
             lanes_var.set(n_value)
@@ -117,27 +322,79 @@ class Crossing(Editable):
             # delete connection
             if self.delete_street:
                 self.delete_street.notify(self, other)
-            self._connected.pop(i)
+            # the position in _connected is only needed here
+            i = next(
+                (i for i, (crossing, _) in enumerate(self._connected) if crossing is other),
+                None
+            )
+            if i is not None:
+                # _sync_conn_index removes it from the indices
+                self._connected.pop(i)
+            else:
+                # the row itself was changed in place, e.g. row[0] = x,
+                # which _connected doesn't report
+                del self._conn_index[other]
+                del self._lanes[other]
+                other._reverse_connections.discard(self)
 
     def is_connected(self, other):
         """Checks if crossing is already connected to other crossing
         Returns Bool, <number_of_lanes> (None, int)"""
-        for c, n in self._connected:
-            if c == other:
-                return n.get()
-        return 0
+        return self._lanes.get(other, 0)
+
+    def to_bytes(self, idx_of) -> bytes:
+        """Packs the crossing and its connections, see StreetData.save
+
+        IDX_OF maps every crossing to the index it is saved with"""
+
+        x, y = self._px, self._py
+        parts = [_CROSSING_RECORD.pack(
+            x, y, self.traffic_lights, self.is_io_node, len(self._lanes)
+        )]
+        parts.extend(
+            _CONNECTION_RECORD.pack(idx_of[other], lanes)
+            for other, lanes in self._lanes.items()
+        )
+        return b"".join(parts)
 
     def delete_streets(self):
         if self.delete_street:
-            for other, lanes in self._connected:
+            for other in self._lanes:
                 self.delete_street.notify(self, other)
             
 
 class StreetData:
-    def __init__(self, log=False):
+    # side length of the square cells of the grid index. Queries with a
+    # max_dist of at most this length only look at 3x3 cells
+    GRID_CELL_SIZE = 50
+
+    def __init__(self, log=False, master=None):
+        """MASTER is a widget used to schedule work for when the event
+        loop is idle, see Crossing.master"""
+
+        self.master = master
         self._crossings = []
+        # The positions of the crossings in the same order as _crossings,
+        # stored as contiguous arrays of ints so get_nearest doesn't have to
+        # read the IntVars of every crossing. _rows maps crossings to their index
+        self._xs = array("i")
+        self._ys = array("i")
+        self._rows = {}
+        # Grid index for get_nearest in the format {(gx, gy): [crossing, ...]}
+        # with the cell every crossing is in stored in _cells
+        self._grid = {}
+        self._cells = {}
+        # Increased whenever a crossing is added, deleted or moved, so
+        # results computed from the positions can be cached on it. Moves
+        # are counted right when the position is written, through
+        # on_pos_write, not only once the redraw is flushed
+        self.version = 0
         self.on_pos_change = event.Event(name="on_pos_change", log=log)
         self.on_pos_change += self._redraw_on_pos_change
+        # keeps the positions and the grid index up to date on every
+        # write, only the redraw is deferred to on_pos_change
+        self.on_pos_write = event.Event(name="on_pos_write", log=False)
+        self.on_pos_write += self._update_position
         self.draw_crossing = event.Event(name="draw_crossing", log=log)
         self.delete_crossing = event.Event(name="delete_crossing")
         self.draw_street = event.Event(name="draw_street", log=log)
@@ -147,81 +404,236 @@ class StreetData:
     def add(self, c: Crossing):
         # TODO: Solve the case where the crossing already has observers
         c.on_pos_change = self.on_pos_change
+        c.on_pos_write = self.on_pos_write
         c.draw_street = self.draw_street
         c.draw_crossing = self.draw_crossing
         c.delete_street = self.delete_street
+        c.master = self.master
+        x, y = c.position_xy
+        self.version += 1
+        self._rows[c] = len(self._crossings)
         self._crossings.append(c)
+        self._xs.append(x)
+        self._ys.append(y)
+        self._move_to_cell(c, x, y)
     
     def delete(self, c: Crossing):
-        idel = None
-        for i, crossing in enumerate(self._crossings):
-            if crossing == c: 
-                idel = i
-            elif crossing.is_connected(c):
-                crossing.disconnect(c, 1, force=True)
-        if i is not None:
-            c = self._crossings.pop(idel)
-            c.delete_streets()
-            self.delete_crossing.notify(c)
-            for other, lanes in c._connected:
-                c.disconnect(other, 1, force=True)
+        idel = self._rows.get(c)
+        if idel is None:
+            return
+        self.version += 1
+        # only the crossings with a street leading to c have to be
+        # disconnected, they are known without checking every crossing
+        for other in list(c._reverse_connections):
+            other.disconnect(c, 1, force=True)
+        # disconnect removes from _connected, so iterate over a copy
+        for other in list(c._lanes):
+            c.disconnect(other, 1, force=True)
+        self._crossings.pop(idel)
+        self._remove_position(idel, c)
+        # its IntVars can still be written to, e.g. by the editor, but
+        # a deleted crossing must not be redrawn after all
+        c._pos_change_pending = False
+        c.on_pos_change = c.on_pos_write = c.draw_crossing = None
+        c.draw_street = c.delete_street = None
+        c.master = None
+        self.delete_crossing.notify(c)
+
+    def _update_position(self, crossing):
+        """Stores the new position of CROSSING"""
+
+        i = self._rows.get(crossing)
+        if i is None:
+            return
+        x, y = crossing.position_xy
+        if x != self._xs[i] or y != self._ys[i]:
+            # results cached on the version stay valid if the same
+            # position was written again
+            self.version += 1
+            self._xs[i], self._ys[i] = x, y
+            self._move_to_cell(crossing, x, y)
+
+    def _remove_position(self, i, crossing):
+        """Removes the position of CROSSING, which was stored in row I"""
+
+        del self._xs[i]
+        del self._ys[i]
+        del self._rows[crossing]
+        # every row after it moves up by one
+        crossings = self._crossings
+        for row in range(i, len(crossings)):
+            self._rows[crossings[row]] = row
+        self._remove_from_cell(crossing, self._cells.pop(crossing))
+
+    def _move_to_cell(self, crossing, x, y):
+        """Puts CROSSING into the cell of the grid index containing x, y"""
+
+        size = StreetData.GRID_CELL_SIZE
+        cell = (x // size, y // size)
+        old_cell = self._cells.get(crossing)
+        if cell == old_cell:
+            return
+        if old_cell is not None:
+            self._remove_from_cell(crossing, old_cell)
+        self._cells[crossing] = cell
+        self._grid.setdefault(cell, []).append(crossing)
+
+    def _remove_from_cell(self, crossing, cell):
+        """Removes CROSSING from CELL of the grid index, and the cell
+        itself once it is empty"""
+
+        bucket = self._grid[cell]
+        bucket.remove(crossing)
+        if not bucket:
+            del self._grid[cell]
 
     def _redraw_on_pos_change(self, crossing):
         # redraw streets and crossings
         self.draw_crossing.notify(crossing)
-        for c in self._crossings:
-            lanes = c.is_connected(crossing)
-            if lanes:
-                self.draw_street.notify(c, crossing, lanes)
-                
-        for other, lanes in crossing._connected:
-            self.draw_street.notify(crossing, other, lanes)
-
-    def get_nearest(self, x, y):
-        nearest_crossing = None
-        min_dist_sqr = None
-        for c in self._crossings:
-            dist_sqr = (c.position[0]-x)**2 + (c.position[1]-y)**2
-            if min_dist_sqr is None or dist_sqr < min_dist_sqr:
-                nearest_crossing = c
-                min_dist_sqr = dist_sqr
-        return min_dist_sqr, nearest_crossing
-    
+        draw_street = self.draw_street.notify
+        # only the crossings with a street leading here are visited, each
+        # of them knows the lanes of that street without searching
+        for c in crossing._reverse_connections:
+            draw_street(c, crossing, c._lanes[crossing])
+        for other, lanes in crossing._lanes.items():
+            draw_street(crossing, other, lanes)
+
+    def get_nearest(self, x, y, max_dist=None) -> tuple[int | None, Crossing | None]:
+        """Returns (squared distance, crossing) of the crossing nearest to x, y
+
+        Returns (None, None) if there are no crossings, or if MAX_DIST is
+        given and no crossing is at most MAX_DIST away.
+        The distance stays squared (no square root is taken anywhere in
+        the search), compare it to squared thresholds"""
+
+        if not self._crossings:
+            return None, None
+        return self._get_nearest_in_grid(x, y, max_dist)
+
+    def _get_nearest_in_grid(self, x, y, max_dist):
+        """get_nearest using the grid index
+
+        The cells are searched in rings of growing size around the cell
+        of x, y. Every crossing outside of the rings searched so far is
+        farther away than their inner border, so the search stops as soon
+        as the nearest crossing found so far is within it, or MAX_DIST is.
+        Picks (a small MAX_DIST) therefore only need the 3x3 cells around
+        x, y, and often only the cell of x, y itself.
+        Once a ring would have more cells than there are crossings, all
+        crossings are scanned instead"""
+
+        size = StreetData.GRID_CELL_SIZE
+        gx, gy = int(x // size), int(y // size)
+        grid = self._grid
+        n_crossings = len(self._crossings)
+        max_dist_sqr = math.inf if max_dist is None else max_dist*max_dist
+        # distance from x, y to the nearest border of its cell
+        left = x - gx*size
+        top = y - gy*size
+        margin = min(left, size - left, top, size - top)
+
+        nearest = None
+        dist_sqr = None
+        r = 0
+        while True:
+            if (2*r + 1)**2 > n_crossings:
+                i, d = _nearest_index(self._xs, self._ys, x, y, max_dist_sqr)
+                if i is None:
+                    return None, None
+                return d, self._crossings[i]
+            for cell in _ring(gx, gy, r):
+                bucket = grid.get(cell)
+                if bucket:
+                    d, c = _nearest_in_bucket(bucket, x, y, max_dist_sqr)
+                    if c is not None:
+                        dist_sqr, nearest, max_dist_sqr = d, c, d
+            # everything that wasn't searched yet is at least this far away
+            reach = r*size + margin
+            if reach*reach >= max_dist_sqr:
+                break
+            r += 1
+
+        if nearest is None:
+            return None, None
+        return dist_sqr, nearest
+
+    def save(self, path):
+        """Saves the street data to PATH in a compact binary format
+
+        Unlike export_to_json, this also saves the positions and can be
+        read again with load"""
+
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(len(self._crossings)))
+            # _rows already maps every crossing to its index
+            for c in self._crossings:
+                f.write(c.to_bytes(self._rows))
+
+    def load(self, path):
+        """Adds the crossings saved to PATH with save and draws them"""
+
+        with open(path, "rb") as f:
+            data = f.read()
+        n, = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        loaded = []
+        for _ in range(n):
+            x, y, traffic_lights, is_io_node, n_conn = _CROSSING_RECORD.unpack_from(
+                data, offset
+            )
+            offset += _CROSSING_RECORD.size
+            connections = [
+                _CONNECTION_RECORD.unpack_from(data, offset + i*_CONNECTION_RECORD.size)
+                for i in range(n_conn)
+            ]
+            offset += n_conn*_CONNECTION_RECORD.size
+            c = Crossing([x, y], traffic_lights=traffic_lights)
+            self.add(c)
+            self.draw_crossing.notify(c)
+            if is_io_node:
+                c.is_io_node = True
+            loaded.append((c, connections))
+        # the streets can only be drawn once all crossings exist
+        for c, connections in loaded:
+            for i, lanes in connections:
+                c.connect(loaded[i][0], lanes)
+
     def export_to_json(self, path=None, debug=False):
         """Creates a json file from the street data"""
         
-        json_dict = {
-            "crossings" : [],
-        }
-        
-        index_mapping = {
-            c: i for i, c in enumerate(self._crossings)
-        }
+        # _rows already maps every crossing to its index
+        index_mapping = self._rows
         
-        for i, c in enumerate(self._crossings):
-            json_dict["crossings"].append(
+        json_dict = {
+            "crossings" : [
                 {
                     "traffic_lights": c.traffic_lights,
                     "is_io_node": c.is_io_node,
                     "connected": [
-                        (index_mapping[connection], lanes.get()) for connection, lanes in c._connected
+                        (index_mapping[connection], lanes) for connection, lanes in c._lanes.items()
                     ]
                 }
-            )
+                for c in self._crossings
+            ],
+        }
         
-        if not debug:
-            text = json.dumps(json_dict)
-            if path:
-                with open(path, "w") as f:
-                    f.write(text)
-            else:
-                with filedialog.asksaveasfile() as f:
-                    f.write(text)
-        else:
+        if debug:
             pprint(json_dict)
+            return
 
-
-        
+        # json.dumps encodes in C, json.dump would use the much slower
+        # pure Python encoder to write the file in chunks
+        data = json.dumps(json_dict, separators=(",", ":"))
+        if path:
+            with open(path, "w") as f:
+                f.write(data)
+        else:
+            f = filedialog.asksaveasfile()
+            if f is None:
+                # the dialog was cancelled
+                return
+            with f:
+                f.write(data)
 
 
 
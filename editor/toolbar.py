@@ -1,4 +1,5 @@
 import tkinter
+import functools
 import event
 import enum
 
@@ -13,49 +14,39 @@ class Toolbar(tkinter.Frame):
     
     COLOR_SELECTED = "red"
     COLOR_DEFAULT = "grey"
+    # the buttons of the toolbar, from top to bottom
+    TOOL_TEXTS = (
+        (Tool.SELECTION, "Selection"),
+        (Tool.DELETION, "Delete"),
+        (Tool.ADD, "Add"),
+        (Tool.EXPORT, "Export"),
+    )
 
     def __init__(self, master):
         super().__init__(master)
         
+        # set up events
+        self.tool_changed = event.Event(name="tool_changed")
+        self.on_export = event.Event(name="on_export")
+
         # All tools in the toolbar
-        self._tools = {
-            Tool.SELECTION: 
-                tkinter.Button(
-                    self,
-                    text="Selection", 
-                    bg=Toolbar.COLOR_SELECTED,
-                    command = lambda: self.set_selected_tool(Tool.SELECTION)
-            ),
-            Tool.DELETION: 
-                tkinter.Button(
-                    self,
-                    text="Delete", 
-                    bg=Toolbar.COLOR_DEFAULT,
-                    command = lambda: self.set_selected_tool(Tool.DELETION)
-                ),
-            Tool.ADD:
-                tkinter.Button(
-                    self,
-                    text="Add", 
-                    bg=Toolbar.COLOR_DEFAULT,
-                    command = lambda: self.set_selected_tool(Tool.ADD)
-                ),
-            Tool.EXPORT:
-                tkinter.Button(
-                    self,
-                    text="Export", 
-                    bg=Toolbar.COLOR_DEFAULT,
-                    command = lambda: self.on_export.notify() 
-                ),
-        }
+        self._tools = {}
+        for tool, text in Toolbar.TOOL_TEXTS:
+            if tool == Tool.EXPORT:
+                # exporting is an action, not a tool that stays selected
+                command = self.on_export.notify
+            else:
+                command = functools.partial(self.set_selected_tool, tool)
+            self._tools[tool] = tkinter.Button(
+                self,
+                text=text,
+                bg=Toolbar.COLOR_SELECTED if tool == Tool.SELECTION else Toolbar.COLOR_DEFAULT,
+                command=command
+            )
 
         # Grid tools
         for i, (_tooltype, toolbutton) in enumerate(self._tools.items()):
             toolbutton.grid(row=i, column=0)
-
-        # set up events
-        self.tool_changed = event.Event(name="tool_changed")
-        self.on_export = event.Event(name="on_export")
         
         self._selected_tool = Tool.SELECTION
     